@@ -1,13 +1,20 @@
+import json
 import os
 
 class TypeScriptRouterGenerator:
-    def __init__(self, table_info):
+    def __init__(self, table_info, max_batch_ids=100, enable_export=False, export_chunk_size=None,
+                 enable_metrics=False):
         self.table_info = table_info
         self.table_name = table_info['table_name']
         self.fields = table_info['fields']
+        self.max_batch_ids = max_batch_ids  # GET /?ids= 单次允许的最大 id 数量
+        self.enable_export = enable_export  # 是否生成 GET /export 流式导出路由
+        self.export_chunk_size = export_chunk_size  # 按主键范围分段导出时每段的行数，None 表示单个流式查询
+        self.enable_metrics = enable_metrics  # 是否接入 metrics.ts 中的指标采集中间件
         self.valid_fields = []
         self.auto_increment_fields = set()
         self.timestamp_fields = set()
+        self.key_fields = []  # 主键和唯一键字段，用于 upsert 冲突判断
 
         self._process_fields()
 
@@ -21,6 +28,9 @@ class TypeScriptRouterGenerator:
             enum_value = field.get('enum_value')
             increase = field.get('AUTO_INCREMENT')
 
+            if field.get('PRIMARY_KEY') or field.get('UNIQUE'):
+                self.key_fields.append(name)
+
             if increase:  # 自动增长字段
                 self.auto_increment_fields.add(name)
                 continue  # 不需要包含在 INSERT 和 UPDATE 语句中
@@ -31,6 +41,418 @@ class TypeScriptRouterGenerator:
 
             self.valid_fields.append((name, field_type, length, default_value, enum_value))
 
+        if not self.key_fields:
+            self.key_fields.append('id')  # 未声明主键时沿用路由中默认的 id 列
+
+    def _is_integer_id(self):
+        """id 列是否为整数类型，整数 id 可以在应用层规范化后按字符串匹配"""
+        id_field = next((field for field in self.fields if field['name'] == 'id'), None)
+        return bool(id_field) and id_field['type'].upper() in ('INT', 'INTEGER')
+
+    def _gen_batch_loader(self):
+        """生成批量查询函数以及合并同一事件循环 tick 内单个查询的加载器"""
+        if self._is_integer_id():
+            loaders = self._gen_integer_id_loaders()
+        else:
+            loaders = self._gen_string_id_loaders()
+        return f"""
+const MAX_BATCH_IDS = {self.max_batch_ids};
+{loaders}{self._gen_normalize_id()}
+// 解析 ?ids=1,2,3，规范化、去重并去掉空值，存在非法 id 时返回 null
+function parseIds(raw: unknown): string[] | null {{
+  const ids: string[] = [];
+  for (const part of String(raw).split(',')) {{
+    if (part.trim().length === 0) {{
+      continue;
+    }}
+    const id = normalizeId(part.trim());
+    if (id === null) {{
+      return null;
+    }}
+    ids.push(id);
+  }}
+  return Array.from(new Set(ids));
+}}
+"""
+
+    def _gen_integer_id_loaders(self):
+        """整数 id：按规范化后的 id 对应结果，并合并同一 tick 内的单个查询"""
+        return f"""
+// 按 id 批量查询{self.table_name}，单次最多 MAX_BATCH_IDS 个 id
+async function fetchByIds(ids: string[]): Promise<Map<string, any>> {{
+  const found = new Map<string, any>();
+  for (let i = 0; i < ids.length; i += MAX_BATCH_IDS) {{
+    const chunk = ids.slice(i, i + MAX_BATCH_IDS);
+    const [rows] = await pool.query('SELECT * FROM {self.table_name} WHERE id IN (?)', [chunk]);
+    for (const row of rows as any[]) {{
+      found.set(String(row.id), row);
+    }}
+  }}
+  return found;
+}}
+
+// 按请求中 id 的顺序返回查到的{self.table_name}
+async function fetchListByIds(ids: string[]): Promise<any[]> {{
+  const found = await fetchByIds(ids);
+  return ids.filter((id) => found.has(id)).map((id) => found.get(id));
+}}
+
+// 合并同一事件循环 tick 内的单个{self.table_name}查询（DataLoader 风格）
+type PendingLookup = {{ resolve: (row: any) => void; reject: (error: unknown) => void }};
+let pendingLookups = new Map<string, PendingLookup[]>();
+let flushScheduled = false;
+
+async function flushLookups() {{
+  const batch = pendingLookups;
+  pendingLookups = new Map();
+  flushScheduled = false;
+  try {{
+    const found = await fetchByIds(Array.from(batch.keys()));
+    batch.forEach((waiters, id) => {{
+      const row = found.get(id);
+      waiters.forEach((waiter) => waiter.resolve(row));
+    }});
+  }} catch (error) {{
+    batch.forEach((waiters) => waiters.forEach((waiter) => waiter.reject(error)));
+  }}
+}}
+
+function loadById(id: string): Promise<any> {{
+  return new Promise((resolve, reject) => {{
+    const waiters = pendingLookups.get(id);
+    if (waiters) {{
+      waiters.push({{ resolve, reject }});
+    }} else {{
+      pendingLookups.set(id, [{{ resolve, reject }}]);
+    }}
+    if (!flushScheduled) {{
+      flushScheduled = true;
+      setImmediate(flushLookups);
+    }}
+  }});
+}}
+"""
+
+    def _gen_string_id_loaders(self):
+        """非整数 id：匹配规则取决于列的排序规则（大小写、尾部空格），交给数据库比较，不做合并"""
+        return f"""
+// 按 id 批量查询{self.table_name}，单次最多 MAX_BATCH_IDS 个 id，按数据库返回的顺序输出
+async function fetchListByIds(ids: string[]): Promise<any[]> {{
+  const found: any[] = [];
+  for (let i = 0; i < ids.length; i += MAX_BATCH_IDS) {{
+    const chunk = ids.slice(i, i + MAX_BATCH_IDS);
+    const [rows] = await pool.query('SELECT * FROM {self.table_name} WHERE id IN (?)', [chunk]);
+    found.push(...(rows as any[]));
+  }}
+  return found;
+}}
+
+// 字符串 id 按列的排序规则匹配，应用层无法可靠地对应结果，因此直接查询
+async function loadById(id: string): Promise<any> {{
+  const [rows] = await pool.query('SELECT * FROM {self.table_name} WHERE id = ?', [id]);
+  return (rows as any[])[0];
+}}
+"""
+
+    def _gen_normalize_id(self):
+        """生成 id 规范化函数，使批量结果能按查询返回的 row.id 对应回请求中的 id"""
+        if self._is_integer_id():
+            return """
+const DECIMAL_ID = /^[+-]?(\\d+\\.?\\d*|\\.\\d+)(e[+-]?\\d+)?$/i;
+
+// 与 MySQL 的数值比较保持一致：'01'、'1.0'、' 1' 都规范为 '1'，无法转换为整数时返回 null
+function normalizeId(raw: string): string | null {
+  const text = raw.trim();
+  const value = Number(text);
+  if (!DECIMAL_ID.test(text) || !Number.isSafeInteger(value)) {
+    return null;
+  }
+  return String(value);
+}
+"""
+        return """
+// 字符串 id 原样交给数据库比较，只拒绝空值
+function normalizeId(raw: string): string | null {
+  return raw.length > 0 ? raw : null;
+}
+"""
+
+    def _gen_field_check(self, field):
+        """根据列类型、长度和枚举值生成单个字段的校验语句"""
+        name, field_type, length, default_value, enum_value = field
+        field_type = field_type.upper()
+        value = f"body.{name}"
+
+        if field_type == 'ENUM' and enum_value:
+            condition = f"typeof {value} !== 'string' || !ENUM_{name.upper()}.has({value})"
+            message = f"{name} must be one of: {', '.join(enum_value)}"
+        elif field_type == 'VARCHAR' and length:
+            # length 统计 UTF-16 码元，超出时再按码点计数，与 MySQL 按字符计算长度一致
+            condition = (
+                f"typeof {value} !== 'string' || ({value}.length > {int(length)} && [...{value}].length > {int(length)})"
+            )
+            message = f"{name} must be a string of at most {int(length)} characters"
+        elif field_type == 'VARCHAR':
+            condition = f"typeof {value} !== 'string'"
+            message = f"{name} must be a string"
+        elif field_type == 'TEXT':
+            condition = f"typeof {value} !== 'string' || Buffer.byteLength({value}) > 65535"
+            message = f"{name} must be a string of at most 65535 bytes"
+        elif field_type in ('INT', 'INTEGER'):
+            condition = f"!Number.isInteger({value}) || {value} < -2147483648 || {value} > 2147483647"
+            message = f"{name} must be a 32-bit signed integer"
+        elif field_type == 'REAL':
+            condition = f"typeof {value} !== 'number' || !Number.isFinite({value})"
+            message = f"{name} must be a number"
+        elif field_type == 'BOOLEAN':
+            condition = f"typeof {value} !== 'boolean' && {value} !== 0 && {value} !== 1"
+            message = f"{name} must be a boolean"
+        elif field_type == 'TIMESTAMP':
+            condition = f"typeof {value} !== 'string' && typeof {value} !== 'number'"
+            message = f"{name} must be a timestamp"
+        else:
+            return None
+
+        return (
+            f"  if ({value} != null && ({condition})) {{\n"
+            f"    return {json.dumps(message, ensure_ascii=False)};\n"
+            f"  }}"
+        )
+
+    def _gen_validator(self):
+        """生成预编译的请求体校验函数，在占用数据库连接之前拒绝非法请求"""
+        enum_sets = []
+        checks = []
+        for field in self.valid_fields:
+            name, field_type, length, default_value, enum_value = field
+            if field_type.upper() == 'ENUM' and enum_value:
+                values = ', '.join(json.dumps(value, ensure_ascii=False) for value in enum_value)
+                enum_sets.append(f"const ENUM_{name.upper()} = new Set<string>([{values}]);")
+            check = self._gen_field_check(field)
+            if check:
+                checks.append(check)
+
+        enum_block = '\n' + '\n'.join(enum_sets) + '\n' if enum_sets else ''
+        return f"""{enum_block}
+// 校验{self.table_name}请求体，返回错误信息，校验通过时返回 null
+export function validateBody(body: any): string | null {{
+  if (typeof body !== 'object' || body === null || Array.isArray(body)) {{
+    return 'request body must be an object';
+  }}
+{chr(10).join(checks)}
+  return null;
+}}
+"""
+
+    def _gen_pool_import(self):
+        """生成连接池 import，启用指标时使用带计时的连接池包装"""
+        if self.enable_metrics:
+            return "import { instrumentPool, metricsMiddleware } from './metrics';"
+        return "import pool from '../db';"
+
+    def _gen_metrics_setup(self):
+        """生成带计时的连接池并挂载指标采集中间件"""
+        if not self.enable_metrics:
+            return ''
+        return (
+            f"const pool = instrumentPool('{self.table_name}');\n\n"
+            f"router.use(metricsMiddleware('{self.table_name}'));\n"
+        )
+
+    def _gen_write_statements(self):
+        """生成按列组合缓存 PATCH / upsert 语句的辅助函数"""
+        writable_columns = ', '.join(f"'{field[0]}'" for field in self.valid_fields)
+        upsert_columns = [name for name in self.key_fields if name not in {field[0] for field in self.valid_fields}]
+        upsert_columns += [field[0] for field in self.valid_fields]
+        key_columns = ', '.join(f"'{name}'" for name in self.key_fields)
+        return f"""
+const WRITABLE_COLUMNS = [{writable_columns}];
+const UPSERT_COLUMNS = [{', '.join(f"'{name}'" for name in upsert_columns)}];
+const UPSERT_KEY_COLUMNS = new Set<string>([{key_columns}]);
+const STATEMENT_CACHE_LIMIT = 256;
+
+// 按列组合缓存 SQL，相同列组合复用同一条语句文本，配合 execute 复用服务端预处理语句
+const statementCache = new Map<string, string>();
+
+function cachedStatement(key: string, build: () => string): string {{
+  let sql = statementCache.get(key);
+  if (sql === undefined) {{
+    sql = build();
+    if (statementCache.size < STATEMENT_CACHE_LIMIT) {{
+      statementCache.set(key, sql);
+    }}
+  }}
+  return sql;
+}}
+
+// 只更新请求体中出现的列
+function buildPatchStatement(columns: string[]): string {{
+  return cachedStatement(`patch:${{columns.join(',')}}`, () =>
+    `UPDATE {self.table_name} SET ${{columns.map((column) => `${{column}} = ?`).join(', ')}} WHERE id = ?`);
+}}
+
+// 主键或唯一键冲突时更新请求体中出现的所有非主键列（包括可写的唯一键列）
+// id = LAST_INSERT_ID(id) 使更新已有行时 insertId 返回该行的 id
+function buildUpsertStatement(columns: string[]): string {{
+  return cachedStatement(`upsert:${{columns.join(',')}}`, () => {{
+    const updates = columns.filter((column) => column !== 'id');
+    const assignments = updates
+      .map((column) => `${{column}} = VALUES(${{column}})`)
+      .concat('id = LAST_INSERT_ID(id)')
+      .join(', ');
+    return `INSERT INTO {self.table_name} (${{columns.join(', ')}}) VALUES (${{columns.map(() => '?').join(', ')}}) ON DUPLICATE KEY UPDATE ${{assignments}}`;
+  }});
+}}
+"""
+
+    def _gen_export_imports(self):
+        """生成导出路由所需的 import"""
+        if not self.enable_export:
+            return ''
+        if self.export_chunk_size:
+            return ''
+        return "import { Transform, pipeline } from 'stream';\n"
+
+    def _gen_export_stream_timing(self):
+        """启用指标时记录流式导出查询的耗时"""
+        if not self.enable_metrics:
+            return ''
+        return "    pool.timeStream(rows);\n"
+
+    def _gen_export_route(self):
+        """生成 GET /export 路由，以 NDJSON 或 CSV 流式输出整张表"""
+        if not self.enable_export:
+            return ''
+
+        columns = ', '.join(f"'{field['name']}'" for field in self.fields)
+        helpers = f"""
+const EXPORT_COLUMNS = [{columns}];
+
+// 将单个值转换为 CSV 单元格
+function toCsvCell(value: any): string {{
+  if (value === null || value === undefined) {{
+    return '';
+  }}
+  let text = value instanceof Date ? value.toISOString() : typeof value === 'object' ? JSON.stringify(value) : String(value);
+  if (/[",\\r\\n]/.test(text)) {{
+    text = '"' + text.replace(/"/g, '""') + '"';
+  }}
+  return text;
+}}
+
+// 将一行数据编码为 NDJSON 或 CSV 行
+function encodeRow(row: any, format: string): string {{
+  if (format === 'csv') {{
+    return EXPORT_COLUMNS.map((column) => toCsvCell(row[column])).join(',') + '\\n';
+  }}
+  return JSON.stringify(row) + '\\n';
+}}
+
+// 设置导出响应头，CSV 格式先写出表头
+function startExport(req: Request, res: Response): string {{
+  const format = req.query.format === 'csv' ? 'csv' : 'ndjson';
+  res.setHeader('Content-Type', format === 'csv' ? 'text/csv; charset=utf-8' : 'application/x-ndjson; charset=utf-8');
+  res.setHeader('Content-Disposition', `attachment; filename="{self.table_name}.${{format === 'csv' ? 'csv' : 'ndjson'}}"`);
+  if (format === 'csv') {{
+    res.write(EXPORT_COLUMNS.join(',') + '\\n');
+  }}
+  return format;
+}}
+"""
+
+        if self.export_chunk_size:
+            return helpers + f"""
+const EXPORT_CHUNK_SIZE = {int(self.export_chunk_size)};
+
+// 等待响应缓冲区排空，客户端断开时同样返回
+function waitForDrain(res: Response): Promise<void> {{
+  return new Promise((resolve) => {{
+    // 客户端已断开时 drain 和 close 都不会再触发
+    if (res.destroyed || res.writableEnded) {{
+      resolve();
+      return;
+    }}
+    const done = () => {{
+      res.off('drain', done);
+      res.off('close', done);
+      resolve();
+    }};
+    res.on('drain', done);
+    res.on('close', done);
+  }});
+}}
+
+// 流式导出{self.table_name}，按主键范围分段查询，避免长时间占用单个查询
+router.get('/export', async (req: Request, res: Response) => {{
+  try {{
+    const format = startExport(req, res);
+    let lastId: any = null;
+    while (!res.destroyed) {{
+      const [rows] = lastId === null
+        ? await pool.query('SELECT * FROM {self.table_name} ORDER BY id LIMIT ?', [EXPORT_CHUNK_SIZE])
+        : await pool.query('SELECT * FROM {self.table_name} WHERE id > ? ORDER BY id LIMIT ?', [lastId, EXPORT_CHUNK_SIZE]);
+      if (res.destroyed) {{
+        return;
+      }}
+      const chunk = rows as any[];
+      for (const row of chunk) {{
+        if (!res.write(encodeRow(row, format))) {{
+          await waitForDrain(res);
+          if (res.destroyed) {{
+            return;
+          }}
+        }}
+      }}
+      if (chunk.length < EXPORT_CHUNK_SIZE) {{
+        break;
+      }}
+      lastId = chunk[chunk.length - 1].id;
+    }}
+    res.end();
+  }} catch (error) {{
+    if (res.headersSent) {{
+      res.destroy(isError(error) ? error : undefined);
+    }} else if (isError(error)) {{
+      res.status(500).json({{ error: error.message }});
+    }} else {{
+      res.status(500).json({{ error: 'Unknown error' }});
+    }}
+  }}
+}});
+"""
+
+        return helpers + f"""
+// 流式导出{self.table_name}，逐行读取并遵循响应的背压
+router.get('/export', async (req: Request, res: Response) => {{
+  try {{
+    const connection = await pool.getConnection();
+    const format = startExport(req, res);
+    const rows = (connection as any).connection.query('SELECT * FROM {self.table_name}').stream();
+{self._gen_export_stream_timing()}    const encoder = new Transform({{
+      writableObjectMode: true,
+      transform(row, _encoding, callback) {{
+        callback(null, encodeRow(row, format));
+      }},
+    }});
+
+    pipeline(rows, encoder, res, (error) => {{
+      if (error) {{
+        // 查询可能尚未读完，不能把连接放回连接池
+        connection.destroy();
+      }} else {{
+        connection.release();
+      }}
+    }});
+  }} catch (error) {{
+    if (isError(error)) {{
+      res.status(500).json({{ error: error.message }});
+    }} else {{
+      res.status(500).json({{ error: 'Unknown error' }});
+    }}
+  }}
+}});
+"""
+
     def generate_router_code(self):
         """生成 TypeScript 路由代码"""
         insert_fields = []
@@ -43,17 +465,22 @@ class TypeScriptRouterGenerator:
 
         router_template = f"""
 import express, {{ Request, Response }} from 'express';
-import pool from '../db';
-
+{self._gen_pool_import()}
+{self._gen_export_imports()}
 const router = express.Router();
-
+{self._gen_metrics_setup()}
 // 创建类型保护函数
 function isError(error: unknown): error is Error {{
   return error instanceof Error;
 }}
-
+{self._gen_batch_loader()}{self._gen_validator()}{self._gen_write_statements()}
 // 创建{self.table_name}（C）
 router.post('/', async (req: Request, res: Response) => {{
+  const invalid = validateBody(req.body);
+  if (invalid) {{
+    res.status(400).json({{ message: invalid }});
+    return;
+  }}
   const {{ {', '.join(insert_fields)} }} = req.body;
 
   let values = [{', '.join([f"req.body.{field[0]}" for field in self.valid_fields])}];
@@ -75,9 +502,26 @@ router.post('/', async (req: Request, res: Response) => {{
   }}
 }});
 
-// 获取所有{self.table_name}（R）
+// 获取所有{self.table_name}，或通过 ?ids=1,2,3 批量获取（R）
 router.get('/', async (req: Request, res: Response) => {{
   try {{
+    if (req.query.ids !== undefined) {{
+      const ids = parseIds(req.query.ids);
+      if (ids === null) {{
+        res.status(400).json({{ message: 'ids must be a comma separated list of valid ids' }});
+        return;
+      }}
+      if (ids.length === 0) {{
+        res.status(400).json({{ message: 'ids must not be empty' }});
+        return;
+      }}
+      if (ids.length > MAX_BATCH_IDS) {{
+        res.status(400).json({{ message: `at most ${{MAX_BATCH_IDS}} ids are allowed` }});
+        return;
+      }}
+      res.json(await fetchListByIds(ids));
+      return;
+    }}
     const [rows] = await pool.query('SELECT * FROM {self.table_name}');
     res.json(rows);
   }} catch (error) {{
@@ -89,13 +533,14 @@ router.get('/', async (req: Request, res: Response) => {{
   }}
 }});
 
+{self._gen_export_route()}
 // 获取单个{self.table_name}（R）
 router.get('/:id', async (req: Request, res: Response) => {{
-  const {{ id }} = req.params;
+  const id = normalizeId(req.params.id);
   try {{
-    const [rows] = await pool.query('SELECT * FROM {self.table_name} WHERE id = ?', [id]);
-    if ((rows as any[]).length > 0) {{
-      res.json((rows as any)[0]);
+    const row = id === null ? undefined : await loadById(id);
+    if (row) {{
+      res.json(row);
     }} else {{
       res.status(404).json({{ message: '{self.table_name} not found' }});
     }}
@@ -111,6 +556,11 @@ router.get('/:id', async (req: Request, res: Response) => {{
 // 更新{self.table_name}（U）
 router.put('/:id', async (req: Request, res: Response) => {{
   const {{ id }} = req.params;
+  const invalid = validateBody(req.body);
+  if (invalid) {{
+    res.status(400).json({{ message: invalid }});
+    return;
+  }}
   const {{ {', '.join([field[0] for field in self.valid_fields])} }} = req.body;
 
   let values = [{', '.join([f"req.body.{field[0]}" for field in self.valid_fields])}, id];
@@ -133,6 +583,77 @@ router.put('/:id', async (req: Request, res: Response) => {{
   }}
 }});
 
+// 部分更新{self.table_name}，只写入请求体中出现的列（U）
+router.patch('/:id', async (req: Request, res: Response) => {{
+  const {{ id }} = req.params;
+  const invalid = validateBody(req.body);
+  if (invalid) {{
+    res.status(400).json({{ message: invalid }});
+    return;
+  }}
+  const columns = WRITABLE_COLUMNS.filter((column) => req.body[column] !== undefined);
+  if (columns.length === 0) {{
+    res.status(400).json({{ message: 'no updatable fields in request body' }});
+    return;
+  }}
+
+  const values = columns.map((column) => req.body[column]);
+  values.push(id);
+
+  try {{
+    const [result] = await pool.execute(buildPatchStatement(columns), values);
+    if ((result as any).affectedRows > 0) {{
+      const updated: any = {{ id }};
+      columns.forEach((column) => {{
+        updated[column] = req.body[column];
+      }});
+      res.json(updated);
+    }} else {{
+      res.status(404).json({{ message: '{self.table_name} not found' }});
+    }}
+  }} catch (error) {{
+    if (isError(error)) {{
+      res.status(500).json({{ error: error.message }});
+    }} else {{
+      res.status(500).json({{ error: 'Unknown error' }});
+    }}
+  }}
+}});
+
+// 按主键或唯一键插入或更新{self.table_name}（C/U）
+router.post('/upsert', async (req: Request, res: Response) => {{
+  const invalid = validateBody(req.body);
+  if (invalid) {{
+    res.status(400).json({{ message: invalid }});
+    return;
+  }}
+  const columns = UPSERT_COLUMNS.filter((column) => req.body[column] !== undefined);
+  if (!columns.some((column) => UPSERT_KEY_COLUMNS.has(column))) {{
+    res.status(400).json({{ message: `one of ${{Array.from(UPSERT_KEY_COLUMNS).join(', ')}} is required` }});
+    return;
+  }}
+
+  const values = columns.map((column) => req.body[column]);
+
+  try {{
+    const [result] = await pool.execute(buildUpsertStatement(columns), values);
+    // mysql2 默认带 CLIENT_FOUND_ROWS，affectedRows 无法可靠区分插入和未变化的更新，因此统一返回 200
+    const saved: any = {{}};
+    columns.forEach((column) => {{
+      saved[column] = req.body[column];
+    }});
+    // 通过唯一键命中已有行时，请求体中的 id 不一定是该行的 id，以 insertId 为准
+    saved.id = (result as any).insertId || req.body.id;
+    res.json(saved);
+  }} catch (error) {{
+    if (isError(error)) {{
+      res.status(500).json({{ error: error.message }});
+    }} else {{
+      res.status(500).json({{ error: 'Unknown error' }});
+    }}
+  }}
+}});
+
 // 删除{self.table_name}（D）
 router.delete('/:id', async (req: Request, res: Response) => {{
   const {{ id }} = req.params;
@@ -163,10 +684,405 @@ export default router;
             file.write(code)
 
 
+class TypeScriptMetricsGenerator:
+    def __init__(self, latency_buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)):
+        self.latency_buckets = latency_buckets  # 直方图桶上界（秒）
+
+    def generate_metrics_code(self):
+        """生成路由共用的指标采集模块，包括中间件、连接池包装和 /metrics 路由"""
+        buckets = ', '.join(str(bucket) for bucket in self.latency_buckets)
+        metrics_template = f"""
+// 用法：各表路由已自动挂载 metricsMiddleware，/metrics 需要在应用中挂载一次，例如
+//   import {{ metricsRouter }} from './out/metrics';
+//   app.use(metricsRouter);  // 暴露 GET /metrics
+import {{ AsyncLocalStorage }} from 'async_hooks';
+import express, {{ NextFunction, Request, Response }} from 'express';
+import pool from '../db';
+
+const BUCKETS = [{buckets}];
+
+// 固定桶直方图，observe 只做一次线性查找和计数，桶在抓取时才累加
+class Histogram {{
+  private series = new Map<string, {{ counts: number[]; sum: number; count: number }}>();
+
+  constructor(private name: string, private help: string) {{}}
+
+  observe(labels: string, seconds: number) {{
+    let entry = this.series.get(labels);
+    if (!entry) {{
+      entry = {{ counts: new Array(BUCKETS.length + 1).fill(0), sum: 0, count: 0 }};
+      this.series.set(labels, entry);
+    }}
+    let i = 0;
+    while (i < BUCKETS.length && seconds > BUCKETS[i]) {{
+      i++;
+    }}
+    entry.counts[i]++;
+    entry.sum += seconds;
+    entry.count++;
+  }}
+
+  render(): string {{
+    const lines = [`# HELP ${{this.name}} ${{this.help}}`, `# TYPE ${{this.name}} histogram`];
+    this.series.forEach((entry, labels) => {{
+      let cumulative = 0;
+      BUCKETS.forEach((bucket, i) => {{
+        cumulative += entry.counts[i];
+        lines.push(`${{this.name}}_bucket{{${{labels}},le="${{bucket}}"}} ${{cumulative}}`);
+      }});
+      lines.push(`${{this.name}}_bucket{{${{labels}},le="+Inf"}} ${{entry.count}}`);
+      lines.push(`${{this.name}}_sum{{${{labels}}}} ${{entry.sum}}`);
+      lines.push(`${{this.name}}_count{{${{labels}}}} ${{entry.count}}`);
+    }});
+    return lines.join('\\n');
+  }}
+}}
+
+const requestDuration = new Histogram('crud_request_duration_seconds', 'Total request latency per route and table');
+const queryDuration = new Histogram('crud_db_query_duration_seconds', 'Database query time per route and table');
+const serializationDuration = new Histogram('crud_serialization_duration_seconds', 'Response serialization time per route and table');
+const poolWaitDuration = new Histogram('crud_pool_wait_duration_seconds', 'Time spent waiting for a pooled connection per route and table');
+
+// 保存当前请求，使连接池包装能够按路由记录数据库耗时
+const requestContext = new AsyncLocalStorage<Request>();
+
+function escapeLabel(value: string): string {{
+  return value.replace(/\\\\/g, '\\\\\\\\').replace(/"/g, '\\\\"').replace(/\\n/g, '\\\\n');
+}}
+
+function secondsSince(start: bigint): number {{
+  return Number(process.hrtime.bigint() - start) / 1e9;
+}}
+
+// 记录每个请求的路由、表、状态码和耗时，并单独统计 res.json 的序列化耗时
+export function metricsMiddleware(table: string) {{
+  return (req: Request, res: Response, next: NextFunction) => {{
+    const start = process.hrtime.bigint();
+    let serialization = 0;
+    const json = res.json.bind(res);
+    res.json = (body?: any) => {{
+      const serializeStart = process.hrtime.bigint();
+      const result = json(body);
+      serialization += secondsSince(serializeStart);
+      return result;
+    }};
+    res.on('finish', () => {{
+      const route = req.route ? req.route.path : 'unmatched';
+      const labels = `table="${{escapeLabel(table)}}",route="${{escapeLabel(route)}}",method="${{req.method}}",status="${{res.statusCode}}"`;
+      requestDuration.observe(labels, secondsSince(start));
+      if (serialization > 0) {{
+        serializationDuration.observe(labels, serialization);
+      }}
+    }});
+    requestContext.run(req, next);
+  }};
+}}
+
+// 包装连接池：按路由和表分别记录等待连接的时间和查询执行时间
+export function instrumentPool(table: string) {{
+  const tableLabel = `table="${{escapeLabel(table)}}"`;
+
+  // req.route 在路由匹配后才设置，因此在记录时读取
+  function currentLabels(): string {{
+    const req = requestContext.getStore();
+    if (!req) {{
+      return `${{tableLabel}},route="none",method="none"`;
+    }}
+    const route = req.route ? req.route.path : 'unmatched';
+    return `${{tableLabel}},route="${{escapeLabel(route)}}",method="${{req.method}}"`;
+  }}
+
+  async function acquire() {{
+    const start = process.hrtime.bigint();
+    const connection = await pool.getConnection();
+    poolWaitDuration.observe(currentLabels(), secondsSince(start));
+    return connection;
+  }}
+
+  async function timed<T>(run: () => Promise<T>): Promise<T> {{
+    const start = process.hrtime.bigint();
+    try {{
+      return await run();
+    }} finally {{
+      queryDuration.observe(currentLabels(), secondsSince(start));
+    }}
+  }}
+
+  // 借出的连接同样记录 query / execute 耗时（批量事务等直接使用连接的路由）
+  async function getConnection() {{
+    const connection = await acquire();
+    const query = connection.query.bind(connection);
+    const execute = connection.execute.bind(connection);
+    (connection as any).query = (sql: string, values?: any) => timed(() => query(sql, values));
+    (connection as any).execute = (sql: string, values?: any) => timed(() => execute(sql, values));
+    return connection;
+  }}
+
+  async function query(sql: string, values?: any): Promise<any> {{
+    const connection = await acquire();
+    try {{
+      return await timed(() => connection.query(sql, values));
+    }} finally {{
+      connection.release();
+    }}
+  }}
+
+  async function execute(sql: string, values?: any): Promise<any> {{
+    const connection = await acquire();
+    try {{
+      return await timed(() => connection.execute(sql, values));
+    }} finally {{
+      connection.release();
+    }}
+  }}
+
+  // 流式查询从发出到行流关闭计为一次查询耗时；标签在开始时确定，事件回调中不一定处于请求上下文
+  function timeStream(stream: NodeJS.EventEmitter) {{
+    const labels = currentLabels();
+    const start = process.hrtime.bigint();
+    stream.once('close', () => queryDuration.observe(labels, secondsSince(start)));
+  }}
+
+  return {{ query, execute, getConnection, timeStream }};
+}}
+
+// 连接池状态在抓取时读取，不在请求路径上产生开销
+function renderPoolGauges(): string {{
+  const core = (pool as any).pool || {{}};
+  const gauges: [string, string, number][] = [
+    ['crud_pool_connections', 'Connections currently open', (core._allConnections || []).length],
+    ['crud_pool_free_connections', 'Idle connections in the pool', (core._freeConnections || []).length],
+    ['crud_pool_queue_depth', 'Requests waiting for a pooled connection', (core._connectionQueue || []).length],
+  ];
+  return gauges.map(([name, help, value]) => `# HELP ${{name}} ${{help}}\\n# TYPE ${{name}} gauge\\n${{name}} ${{value}}`).join('\\n');
+}}
+
+export const metricsRouter = express.Router();
+
+// 以 Prometheus 文本格式输出所有指标
+metricsRouter.get('/metrics', (req: Request, res: Response) => {{
+  const body = [
+    requestDuration.render(),
+    queryDuration.render(),
+    serializationDuration.render(),
+    poolWaitDuration.render(),
+    renderPoolGauges(),
+  ].join('\\n');
+  res.setHeader('Content-Type', 'text/plain; version=0.0.4; charset=utf-8');
+  res.send(body + '\\n');
+}});
+"""
+        return metrics_template
+
+    def save_to_file(self, output_path):
+        """将生成的 TypeScript 指标模块保存到文件"""
+        code = self.generate_metrics_code()
+        with open(output_path, 'w', encoding="UTF-8") as file:
+            file.write(code)
+
+
+class TypeScriptBatchRouterGenerator:
+    def __init__(self, table_infos, max_batch_operations=100, enable_metrics=False):
+        self.table_infos = table_infos
+        self.max_batch_operations = max_batch_operations  # 单个批量请求允许的最大操作数
+        self.enable_metrics = enable_metrics
+
+    def _gen_imports(self):
+        """生成各表校验函数以及连接池的 import"""
+        imports = []
+        for table_info in self.table_infos:
+            table_name = table_info['table_name']
+            imports.append(f"import {{ validateBody as validate{table_name.capitalize()} }} from './{table_name}_router';")
+        if self.enable_metrics:
+            imports.append("import { instrumentPool, metricsMiddleware } from './metrics';")
+            imports.append("\nconst pool = instrumentPool('batch');")
+        else:
+            imports.insert(0, "import pool from '../db';")
+        return '\n'.join(imports)
+
+    def _gen_table_specs(self):
+        """生成每张表可写列和校验函数的映射"""
+        specs = []
+        for table_info in self.table_infos:
+            table_name = table_info['table_name']
+            generator = TypeScriptRouterGenerator(table_info)
+            columns = ', '.join(f"'{field[0]}'" for field in generator.valid_fields)
+            specs.append(
+                f"  {table_name}: {{ columns: [{columns}], validate: validate{table_name.capitalize()} }},"
+            )
+        return '\n'.join(specs)
+
+    def _gen_metrics_middleware(self):
+        """启用指标时只在 POST /batch 上挂载指标采集中间件，避免统计经过该路由器的其他请求"""
+        if not self.enable_metrics:
+            return ''
+        return "metricsMiddleware('batch'), "
+
+    def generate_batch_router_code(self):
+        """生成 POST /batch 路由，在单个连接的事务中执行多表增删改"""
+        batch_template = f"""
+import express, {{ Request, Response }} from 'express';
+{self._gen_imports()}
+
+const router = express.Router();
+
+const MAX_BATCH_OPERATIONS = {self.max_batch_operations};
+
+// 各表允许写入的列及请求体校验函数
+const TABLES: {{ [table: string]: {{ columns: string[]; validate: (body: any) => string | null }} }} = {{
+{self._gen_table_specs()}
+}};
+
+type Operation = {{ op: 'create' | 'update' | 'delete'; table: string; id?: any; data?: any }};
+
+// 创建类型保护函数
+function isError(error: unknown): error is Error {{
+  return error instanceof Error;
+}}
+
+// 在占用连接之前校验单个操作，返回错误信息或 null
+function validateOperation(operation: any): string | null {{
+  if (typeof operation !== 'object' || operation === null) {{
+    return 'operation must be an object';
+  }}
+  if (!Object.prototype.hasOwnProperty.call(TABLES, operation.table)) {{
+    return `unknown table: ${{operation.table}}`;
+  }}
+  const spec = TABLES[operation.table];
+  if (operation.op !== 'create' && operation.op !== 'update' && operation.op !== 'delete') {{
+    return `unknown op: ${{operation.op}}`;
+  }}
+  // 对象或数组形式的 id 会被客户端格式化为 `key` = value 之类的片段，只接受标量
+  if (operation.op !== 'create' && typeof operation.id !== 'string' && typeof operation.id !== 'number') {{
+    return `${{operation.op}} requires a string or number id`;
+  }}
+  if (operation.op === 'delete') {{
+    return null;
+  }}
+  const invalid = spec.validate(operation.data);
+  if (invalid) {{
+    return invalid;
+  }}
+  if (operation.op === 'update' && !spec.columns.some((column) => operation.data[column] !== undefined)) {{
+    return 'no updatable fields in data';
+  }}
+  return null;
+}}
+
+// 将操作转换为 SQL 和参数，update 只写入 data 中出现的列
+function buildStatement(operation: Operation): [string, any[]] {{
+  const {{ columns }} = TABLES[operation.table];
+  if (operation.op === 'delete') {{
+    return [`DELETE FROM ${{operation.table}} WHERE id = ?`, [operation.id]];
+  }}
+  const present = columns.filter((column) => operation.data[column] !== undefined);
+  const values = present.map((column) => operation.data[column]);
+  if (operation.op === 'create') {{
+    return [`INSERT INTO ${{operation.table}} (${{present.join(', ')}}) VALUES (${{present.map(() => '?').join(', ')}})`, values];
+  }}
+  values.push(operation.id);
+  return [`UPDATE ${{operation.table}} SET ${{present.map((column) => `${{column}} = ?`).join(', ')}} WHERE id = ?`, values];
+}}
+
+// 在单个连接的事务中批量执行增删改，任一操作失败则整体回滚
+router.post('/batch', {self._gen_metrics_middleware()}async (req: Request, res: Response) => {{
+  const operations = req.body && req.body.operations;
+  if (!Array.isArray(operations) || operations.length === 0) {{
+    res.status(400).json({{ message: 'operations must be a non-empty array' }});
+    return;
+  }}
+  if (operations.length > MAX_BATCH_OPERATIONS) {{
+    res.status(400).json({{ message: `at most ${{MAX_BATCH_OPERATIONS}} operations are allowed` }});
+    return;
+  }}
+  const errors = operations
+    .map((operation: any, index: number) => ({{ index, error: validateOperation(operation) }}))
+    .filter((result: any) => result.error !== null);
+  if (errors.length > 0) {{
+    res.status(400).json({{ committed: false, errors }});
+    return;
+  }}
+
+  let connection: Awaited<ReturnType<typeof pool.getConnection>>;
+  try {{
+    connection = await pool.getConnection();
+  }} catch (error) {{
+    if (isError(error)) {{
+      res.status(500).json({{ error: error.message }});
+    }} else {{
+      res.status(500).json({{ error: 'Unknown error' }});
+    }}
+    return;
+  }}
+
+  try {{
+    await connection.beginTransaction();
+    // 按顺序执行，遇到第一个失败即停止：死锁或锁等待超时会使 InnoDB 回滚整个事务，
+    // 之后的语句若继续执行将以自动提交方式生效，无法再被回滚
+    const results: any[] = [];
+    let failed = false;
+    for (let index = 0; index < operations.length; index++) {{
+      const operation: Operation = operations[index];
+      const summary = {{ index, op: operation.op, table: operation.table }};
+      if (failed) {{
+        results.push({{ ...summary, status: 'skipped' }});
+        continue;
+      }}
+      try {{
+        const [sql, values] = buildStatement(operation);
+        const [result] = await connection.execute(sql, values);
+        if (operation.op !== 'create' && (result as any).affectedRows === 0) {{
+          results.push({{ ...summary, status: 'error', error: `${{operation.table}} not found` }});
+          failed = true;
+        }} else {{
+          results.push({{ ...summary, status: 'ok', id: operation.op === 'create' ? (result as any).insertId : operation.id }});
+        }}
+      }} catch (error) {{
+        results.push({{ ...summary, status: 'error', error: isError(error) ? error.message : 'Unknown error' }});
+        failed = true;
+      }}
+    }}
+
+    if (failed) {{
+      await connection.rollback().catch(() => undefined);
+      res.status(409).json({{
+        committed: false,
+        results: results.map((result) => (result.status === 'ok' ? {{ ...result, status: 'rolled_back' }} : result)),
+      }});
+      return;
+    }}
+
+    await connection.commit();
+    res.json({{ committed: true, results }});
+  }} catch (error) {{
+    await connection.rollback().catch(() => undefined);
+    if (isError(error)) {{
+      res.status(500).json({{ committed: false, error: error.message }});
+    }} else {{
+      res.status(500).json({{ committed: false, error: 'Unknown error' }});
+    }}
+  }} finally {{
+    connection.release();
+  }}
+}});
+
+export default router;
+"""
+        return batch_template
+
+    def save_to_file(self, output_path):
+        """将生成的 TypeScript 批量路由代码保存到文件"""
+        code = self.generate_batch_router_code()
+        with open(output_path, 'w', encoding="UTF-8") as file:
+            file.write(code)
+
+
 class RouterFileGenerator:
-    def __init__(self, table_infos, output_directory):
+    def __init__(self, table_infos, output_directory, max_batch_operations=100, **generator_options):
         self.table_infos = table_infos
         self.output_directory = output_directory
+        self.max_batch_operations = max_batch_operations  # POST /batch 单次允许的最大操作数
+        self.generator_options = generator_options  # 透传给 TypeScriptRouterGenerator 的生成选项
 
         if not os.path.exists(output_directory):
             os.makedirs(output_directory)
@@ -175,10 +1091,21 @@ class RouterFileGenerator:
         """根据输入的表信息数组生成 TypeScript 路由文件"""
         for table_info in self.table_infos:
             table_name = table_info['table_name']
-            generator = TypeScriptRouterGenerator(table_info)
+            generator = TypeScriptRouterGenerator(table_info, **self.generator_options)
             output_path = os.path.join(self.output_directory, f'{table_name}_router.ts')
             generator.save_to_file(output_path)
 
+        batch_generator = TypeScriptBatchRouterGenerator(
+            self.table_infos,
+            max_batch_operations=self.max_batch_operations,
+            enable_metrics=self.generator_options.get('enable_metrics', False),
+        )
+        batch_generator.save_to_file(os.path.join(self.output_directory, 'batch_router.ts'))
+
+        if self.generator_options.get('enable_metrics'):
+            metrics_path = os.path.join(self.output_directory, 'metrics.ts')
+            TypeScriptMetricsGenerator().save_to_file(metrics_path)
+
 # 使用示例
 table_infos = [
     {
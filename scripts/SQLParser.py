@@ -162,6 +162,14 @@ class SQLParser:
                 if current_field:
                     current_field['AUTO_INCREMENT'] = 'AUTO_INCREMENT'
 
+            elif token_type == 'PRIMARY':
+                if current_field:
+                    current_field['PRIMARY_KEY'] = 'PRIMARY_KEY'
+
+            elif token_type == 'UNIQUE':
+                if current_field:
+                    current_field['UNIQUE'] = 'UNIQUE'
+
             elif token_type == 'COMMENT':
                 index += 1
                 if index < len(self.tokens):